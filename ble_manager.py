@@ -0,0 +1,282 @@
+# ble_manager.py - BLE link to the HID Relay Dongle (Nordic UART Service)
+# Type-checks with `mypy --strict`; optionally compiled with `mypyc ble_manager.py`
+# (experimental, a stale compiled module shadows edits to this file)
+
+import asyncio
+import os
+from collections import deque
+
+from bleak import BleakClient, BleakScanner
+from bleak.backends.characteristic import BleakGATTCharacteristic
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
+
+# ---- NUS(UART) UUID ----
+HID_SERVICE_UUID = "597f1290-5b99-477d-9261-f0ed801fc566"
+HID_RX_CHAR_UUID = "597f1291-5b99-477d-9261-f0ed801fc566"  # Write
+HID_TX_CHAR_UUID = "597f1292-5b99-477d-9261-f0ed801fc566"  # Notify
+_TARGET_SVC_LOWER = HID_SERVICE_UUID.lower()
+
+# ---- MOUSE MOVE WRITE INTERVAL (sec, ~BLE connection interval) ----
+MOUSE_MOVE_INTERVAL = 0.015
+
+# ---- BLE RECONNECT BACKOFF (sec) ----
+RECONNECT_BACKOFF_MIN = 1.0
+RECONNECT_BACKOFF_MAX = 30.0
+
+# ---- BLE TX QUEUE SIZE ----
+# When full, a queued mouse move is evicted (or the new move/press refused);
+# releases are never dropped, so they may briefly exceed the bound.
+TX_QUEUE_SIZE = 32
+TX_DROP_LOG_EVERY = 100  # log the first drop, then every Nth
+_RELEASE_PREFIXES = (b"KR:", b"MS:", b"ME:", b"R:")
+
+# ---- BLE TX BATCHING (b"\n"-joined writes, needs firmware support) ----
+# Off by default: deployed dongle firmware parses one message per write.
+TX_BATCH = False
+
+# ---- OPTIONAL CPU AFFINITY (opt-in with HID_BLE_AFFINITY=1) ----
+# BLE writers share the Qt event loop thread, which is left unpinned (pinning
+# it would also pin every thread it spawns). Instead, heavy worker threads
+# such as the OpenCV capture thread move themselves off BLE_CPU.
+BLE_CPU = 1
+
+
+def set_thread_affinity(cpus: set[int]) -> None:
+    # pin the calling thread, no-op unless HID_BLE_AFFINITY=1
+    if os.environ.get("HID_BLE_AFFINITY") != "1":
+        return
+
+    try:
+        # Linux only, missing on macOS/Windows
+        os.sched_setaffinity(0, cpus)
+    except (AttributeError, OSError) as e:
+        print(f"[BLE] CPU affinity not set : {e}")
+
+
+class BleManager:
+    def __init__(self, target_name: str, scan_timeout: float = 10.0) -> None:
+        self.target_name = target_name
+        self.scan_timeout = scan_timeout
+
+        self.client: BleakClient | None = None
+        self.connected = False
+        self.rx_char: BleakGATTCharacteristic | None = None
+
+        # latest mouse position, only the newest sample is written
+        self._pending_move: tuple[int, int] | None = None
+        self._move_event = asyncio.Event()
+
+        # outgoing messages, drained by a single writer task per connection
+        # entries are (message, is_move)
+        self._tx_queue: deque[tuple[bytes, bool]] = deque()
+        self._tx_ready = asyncio.Event()
+        self._dropped = 0  # messages dropped on queue overflow
+
+    async def run(self) -> None:
+        # retry connect_and_run forever, backing off between attempts
+        # (scheduled on the shared Qt/asyncio loop, no separate BLE thread)
+        backoff = RECONNECT_BACKOFF_MIN
+        while True:
+            try:
+                await self.connect_and_run()
+            except Exception as e:
+                print(f"[BLE] Exeption : {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, RECONNECT_BACKOFF_MAX)
+            else:
+                backoff = RECONNECT_BACKOFF_MIN
+                await asyncio.sleep(backoff)
+
+    async def connect_and_run(self) -> None:
+        # find and connect to NUS device, then register notify
+
+        # 1) Scan Name 
+        def match_hid_device(device: BLEDevice, adv: AdvertisementData) -> bool:
+            name = device.name
+            if not name or self.target_name not in name:
+                return False
+            print(f"[BLE] Found HID Device: {name}")
+            for s in adv.service_uuids:
+                if s.lower() == _TARGET_SVC_LOWER:
+                    return True
+            return False
+
+        print("[BLE] Scanning NUS device...")
+        device: BLEDevice | None = None
+        found = asyncio.Event()
+
+        def detection_callback(d: BLEDevice, adv: AdvertisementData) -> None:
+            nonlocal device
+            if device is None and match_hid_device(d, adv):
+                device = d
+                found.set()
+
+        # active scan, LE transport only on BlueZ
+        async with BleakScanner(
+            detection_callback=detection_callback,
+            scanning_mode="active",
+            bluez={"filters": {"Transport": "le"}},
+        ):
+            try:
+                await asyncio.wait_for(found.wait(), timeout=self.scan_timeout)
+            except asyncio.TimeoutError:
+                pass
+        # print(device)
+
+        if device is None:
+            print("[BLE] NUS Device not found.")
+            return  # exit
+
+        loop = asyncio.get_running_loop()
+        disconnect_event = asyncio.Event()
+
+        def handle_disconnect(_: BleakClient) -> None:
+            print("[BLE] Device disconnected.")
+            # may be called from a backend thread
+            loop.call_soon_threadsafe(disconnect_event.set)
+
+        # 2) connect to NUS device
+        print(f"[BLE] Connecting to {device.address}...")
+        async with BleakClient(device, disconnected_callback=handle_disconnect) as client:
+            self.client = client
+            self._tx_queue.clear()
+            self._tx_ready.clear()
+            # drop moves left over from a previous connection
+            self._pending_move = None
+            self._move_event.clear()
+            self.connected = True
+            print("[BLE] Connected!")
+
+            # 3) Notify configuration (UART_TX_CHAR_UUID)
+            await client.start_notify(HID_TX_CHAR_UUID, self.handle_rx)
+            print("[BLE] Notify on (waiting for data)")
+
+            # 4) Save RX characteristic for write
+            nus_service = client.services.get_service(HID_SERVICE_UUID)
+            if nus_service is None:
+                print("[BLE] NUS service not found.")
+                self.connected = False
+                self.client = None
+                return
+            self.rx_char = nus_service.get_characteristic(HID_RX_CHAR_UUID)
+
+            # 5) Start writers
+            tx_task = asyncio.create_task(self._tx_worker())
+            move_task = asyncio.create_task(self._move_writer())
+
+            try:
+                await disconnect_event.wait()
+            finally:
+                tx_task.cancel()
+                move_task.cancel()
+                print("[BLE] connection closed.")
+                self.connected = False
+                self.client = None
+
+    def handle_rx(self, _: BleakGATTCharacteristic, data: bytearray) -> None:
+        print("[BLE] Recevied :", data)
+
+    def queue_move(self, x: int, y: int) -> None:
+        # overwrite pending position instead of queuing every move event
+        if not self.connected or not self.rx_char:
+            return
+
+        self._pending_move = (x, y)
+        self._move_event.set()
+
+    async def _move_writer(self) -> None:
+        # hands the latest mouse move to the ordered TX queue,
+        # paced at about the connection interval
+        while True:
+            await self._move_event.wait()
+            self._move_event.clear()
+
+            if self._flush_move():
+                await asyncio.sleep(MOUSE_MOVE_INTERVAL)
+
+    def _flush_move(self) -> bool:
+        # enqueue the pending move (if any) ahead of later messages
+        move = self._pending_move
+        if move is None:
+            return False
+
+        self._pending_move = None
+        self._enqueue(b"ML:%d,%d" % move, is_move=True)
+        return True
+
+    def send_data_sync(self, msg: bytes) -> None:
+        if not self.connected or not self.rx_char:
+            print("[BLE] Not connected or RX characteristic not found.")
+            return
+
+        # keep moves ordered before this key/button message
+        self._flush_move()
+        self._enqueue(msg)
+
+    def _enqueue(self, msg: bytes, is_move: bool = False) -> None:
+        queue = self._tx_queue
+        if len(queue) >= TX_QUEUE_SIZE:
+            if is_move:
+                # moves are disposable, refuse the new one
+                self._log_drop(msg)
+                return
+
+            # make room by evicting the oldest queued move
+            for i, (queued, queued_is_move) in enumerate(queue):
+                if queued_is_move:
+                    del queue[i]
+                    self._log_drop(queued)
+                    break
+            else:
+                if not msg.startswith(_RELEASE_PREFIXES):
+                    # refuse a new press, never drop a queued one
+                    self._log_drop(msg)
+                    return
+                # a release is always queued, even past the bound
+
+        queue.append((msg, is_move))
+        self._tx_ready.set()
+
+    def _log_drop(self, msg: bytes) -> None:
+        self._dropped += 1
+        if self._dropped % TX_DROP_LOG_EVERY == 1:
+            print(f"[BLE] TX queue full, dropped {msg!r} ({self._dropped} total)")
+
+    async def _tx_worker(self) -> None:
+        # single writer for queued messages, keeps write order.
+        # with TX_BATCH, messages queued meanwhile are joined with b"\n" into
+        # one write, up to one packet, so the per-write overhead is paid once
+        queue = self._tx_queue
+        while True:
+            if not queue:
+                self._tx_ready.clear()
+                await self._tx_ready.wait()
+                continue
+
+            buf, _ = queue.popleft()
+
+            if TX_BATCH:
+                max_size = self.rx_char.max_write_without_response_size if self.rx_char else 0
+                while queue and len(buf) + 1 + len(queue[0][0]) <= max_size:
+                    msg, _ = queue.popleft()
+                    buf += b"\n" + msg
+
+            try:
+                await self._send_data(buf)
+            except Exception as e:
+                # a failed write must not kill the only writer task
+                print(f"[BLE] Write failed : {e} ({buf!r})")
+
+    async def _send_data(self, msg: bytes) -> None:
+        # BLE GATT write (async)
+        if not self.rx_char or not self.client:
+            print("[BLE] No client or RX characteristic.")
+            return
+
+        data = memoryview(msg)
+        max_size: int = self.rx_char.max_write_without_response_size
+        # sliced write for BLE packet size limit (zero-copy slices)
+        for i in range(0, len(data), max_size):
+            await self.client.write_gatt_char(self.rx_char, data[i : i + max_size], response=False)
+        # print(f"[BLE] send complete : {msg}")
@@ -1,46 +1,45 @@
+import os
 import sys
 import cv2
+import numpy as np
 import threading
 import asyncio
-from itertools import count, takewhile
-from typing import Iterator
 
 from PyQt5.QtWidgets import (
     QApplication, QLabel, QWidget, QVBoxLayout, QSizePolicy
 )
-from PyQt5.QtCore import Qt, QTimer, QSize
+from PyQt5.QtCore import Qt, QSize, QObject, pyqtSignal, QT_VERSION
 from PyQt5.QtGui import QImage, QPixmap
 
-from bleak import BleakClient, BleakScanner, BleakError
-from bleak.backends.characteristic import BleakGATTCharacteristic
-from bleak.backends.device import BLEDevice
-from bleak.backends.scanner import AdvertisementData
+import qasync
+from ble_manager import BleManager, BLE_CPU, set_thread_affinity
 
 from AVFoundation import AVCaptureDevice
 from qtkeystring import qt_key_to_string
 
-# ---- NUS(UART) UUID ----
-HID_SERVICE_UUID = "597f1290-5b99-477d-9261-f0ed801fc566"
-HID_RX_CHAR_UUID = "597f1291-5b99-477d-9261-f0ed801fc566"  # Write
-HID_TX_CHAR_UUID = "597f1292-5b99-477d-9261-f0ed801fc566"  # Notify
-
-
-# ------------------------------------------------------
-def sliced(data: bytes, n: int) -> Iterator[bytes]:
-    return takewhile(len, (data[i : i + n] for i in count(0, n)))
 
 # ===================================================
 # 1. Video Capture
 # ===================================================
-class VideoCaptureAsync:
+class VideoCaptureAsync(QObject):
+    # emitted from the capture thread, queued to the GUI thread by Qt;
+    # only one is in flight at a time, the receiver calls take_frame()
+    frame_ready = pyqtSignal()
+
     def __init__(self, src=0):
+        super().__init__()
         self.src = src
         print(f"Opening camera {src}...")
         self.cap = cv2.VideoCapture(self.src)
-        self.grabbed, self.frame = self.cap.read()
         self.stopped = False
+
+        # latest frame only, older frames are dropped if the GUI lags
         self.lock = threading.Lock()
+        self._latest = None
+        self._pending = False
 
+        # request MJPG before size/fps, YUYV can't sustain 1080p60 over USB 2.0
+        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
         self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1920)
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
         self.cap.set(cv2.CAP_PROP_FPS, 60)
@@ -60,26 +59,35 @@ class VideoCaptureAsync:
         return self
 
     def update(self):
+        # keep capture off the core left for the Qt/BLE thread (opt-in)
+        set_thread_affinity(set(range(os.cpu_count() or 1)) - {BLE_CPU})
+
         while not self.stopped:
             try:
                 grabbed, frame = self.cap.read()
                 if not grabbed:
                     print("Unable to read frame.")
+                    continue
             except cv2.error as e:
                 print(f"Capture device error: {e}")
                 self.stop()
                 break
 
+            # cap.read() returns a fresh array, safe to hand over without copy
             with self.lock:
-                self.grabbed = grabbed
-                self.frame = frame
-
-    def read(self):
+                self._latest = frame
+                notify = not self._pending
+                self._pending = True
+            if notify:
+                self.frame_ready.emit()
+
+    def take_frame(self):
+        # latest frame for the GUI thread, re-arms frame_ready
         with self.lock:
-            if self.grabbed and self.frame is not None:
-                return self.grabbed, self.frame.copy()
-            else:
-                return False, None
+            frame = self._latest
+            self._latest = None
+            self._pending = False
+        return frame
 
     def stop(self):
         self.stopped = True
@@ -87,106 +95,7 @@ class VideoCaptureAsync:
 
 
 # ===================================================
-# 2. BLE Manager (Nordic UART Service)
-# ===================================================
-class BleManager:
-    def __init__(self):
-        self.client: BleakClient | None = None
-        self.connected = False
-        self.rx_char: BleakGATTCharacteristic | None = None
-
-        
-        self.loop = asyncio.new_event_loop()
-        self.thread = threading.Thread(target=self._run_loop, daemon=True)
-        self.thread.start()
-
-    def _run_loop(self):
-        asyncio.set_event_loop(self.loop)
-        while True:
-            try:
-                self.loop.run_until_complete(self.connect_and_run())
-            except Exception as e:
-                print(f"[BLE] Exeption : {e}")
-                self.loop.stop()
-                break
-
-    async def connect_and_run(self):
-        # find and connect to NUS device, then register notify
-
-        # 1) Scan Name 
-        def match_hid_device(device: BLEDevice, adv: AdvertisementData):
-            if device.name and "Remote HID BLE" in device.name:
-                if HID_SERVICE_UUID.lower() in [s.lower() for s in adv.service_uuids]:
-                    return True
-            return False
-
-        print("[BLE] Scanning NUS device...")
-        device = await BleakScanner.find_device_by_filter(match_hid_device, timeout=5.0)
-        # print(device)
-
-        if device is None:
-            print("[BLE] NUS Device not found.")
-            return  # exit
-
-        def handle_disconnect(_: BleakClient):
-            print("[BLE] Device disconnected.")
-            for task in asyncio.all_tasks():
-                task.cancel()
-
-        # 2) connect to NUS device
-        print(f"[BLE] Connecting to {device.address}...")
-        async with BleakClient(device, disconnected_callback=handle_disconnect) as client:
-            self.client = client
-            self.connected = True
-            print("[BLE] Connected!")
-
-            # 3) Notify configuration (UART_TX_CHAR_UUID)
-            await client.start_notify(HID_TX_CHAR_UUID, self.handle_rx)
-            print("[BLE] Notify on (waiting for data)")
-
-            # 4) Save RX characteristic for write
-            nus_service = client.services.get_service(HID_SERVICE_UUID)
-            self.rx_char = nus_service.get_characteristic(HID_RX_CHAR_UUID)
-
-            try:
-                while True:
-                    await asyncio.sleep(1.0)
-            except asyncio.CancelledError:
-                pass
-            finally:
-                print("[BLE] connection closed.")
-                self.connected = False
-                self.client = None
-
-    def handle_rx(self, _: BleakGATTCharacteristic, data: bytearray):
-        print("[BLE] Recevied :", data)
-
-    def send_data_sync(self, msg: str):
-        if not self.connected or not self.rx_char:
-            print("[BLE] Not connected or RX characteristic not found.")
-            return
-
-        future = asyncio.run_coroutine_threadsafe(
-            self._send_data(msg), self.loop
-        )
-        # e.g. result = future.result()
-
-    async def _send_data(self, msg: str):
-        # BLE GATT write (async)
-        if not self.rx_char or not self.client:
-            print("[BLE] No client or RX characteristic.")
-            return
-
-        data = msg.encode()
-        max_size = self.rx_char.max_write_without_response_size
-        # sliced write for BLE packet size limit
-        for chunk in sliced(data, max_size):
-            await self.client.write_gatt_char(self.rx_char, chunk, response=False)
-        print(f"[BLE] send complete : {msg}")
-
-
-# ===================================================
-# 3. PyQt5 GUI App (Video + BLE)
+# 2. PyQt5 GUI App (Video + BLE)
 # ===================================================
 class VideoApp(QWidget):
     def __init__(self, video_source=0, source_name="", ble_manager=None):
@@ -199,45 +108,71 @@ class VideoApp(QWidget):
         self.setGeometry(100, 100, 960, 540)
 
         # VideoCaptureAsync instance
-        self.cap = VideoCaptureAsync(self.video_source).start()
+        self.cap = VideoCaptureAsync(self.video_source)
 
         # QLabel widget(video frame)
         self.image_label = QLabel(self)
         self.image_label.setAlignment(Qt.AlignCenter)
         self.image_label.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Ignored)
         self.image_label.setMinimumSize(1, 1)
+        self._label_size = self.image_label.size()
+
+        # Qt >= 5.14 reads OpenCV's BGR frames directly (Format_BGR888),
+        # older Qt needs a BGR->RGB pass into a preallocated buffer
+        self._use_bgr888 = QT_VERSION >= 0x050E00 and hasattr(QImage, "Format_BGR888")
+        self._rgb = None if self._use_bgr888 else np.empty((1080, 1920, 3), dtype=np.uint8)
+
+        # last rendered pixmap
+        self._pixmap: QPixmap | None = None
 
         # layout
         layout = QVBoxLayout()
         layout.addWidget(self.image_label)
         self.setLayout(layout)
 
-        # 60fps update
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_frame)
-        self.timer.start(16)
+        # update on each captured frame
+        self.cap.frame_ready.connect(self._on_frame)
+        self.cap.start()
 
         # original video size for aspect ratio
         self.original_aspect_ratio = 1920 / 1080
 
-    def update_frame(self):
-        grabbed, frame = self.cap.read()
-        if grabbed and frame is not None:
+    def _on_frame(self):
+        frame = self.cap.take_frame()
+        if frame is None:
+            return
+
+        if self._use_bgr888:
+            image, image_format = frame, QImage.Format_BGR888
+        else:
+            if frame.shape != self._rgb.shape:
+                self._rgb = np.empty(frame.shape, dtype=np.uint8)
             # BGR->RGB
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb)
+            image, image_format = self._rgb, QImage.Format_RGB888
+
+        height, width, channel = image.shape
+        bytes_per_line = 3 * width
+        q_img = QImage(image.data, width, height, bytes_per_line, image_format)
+        self._pixmap = QPixmap.fromImage(q_img)
+        self.update_frame()
 
-            height, width, channel = frame.shape
-            bytes_per_line = 3 * width
-            q_img = QImage(frame.data, width, height, bytes_per_line, QImage.Format_RGB888)
-            pixmap = QPixmap.fromImage(q_img)
+    def update_frame(self):
+        if self._pixmap is None:
+            return
 
-            self.image_label.setPixmap(pixmap.scaled(
-                self.image_label.size(),
+        pixmap = self._pixmap
+        # scale only when the label size differs from the frame
+        if pixmap.size() != self._label_size:
+            pixmap = pixmap.scaled(
+                self._label_size,
                 Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
-            ))
+                Qt.FastTransformation
+            )
+        self.image_label.setPixmap(pixmap)
 
     def resizeEvent(self, event):
+        self._label_size = self.image_label.size()
         self.update_frame()
         super().resizeEvent(event)
 
@@ -247,18 +182,17 @@ class VideoApp(QWidget):
 
         # Send BLE
         if self.ble_manager:
-            self.ble_manager.send_data_sync(f"P:{hex(event.key())}")
+            self.ble_manager.send_data_sync(b"P:%#x" % event.key())
 
     def keyReleaseEvent(self, event):
         # print(f"Key release: {qt_key_to_string(event.key())} (Key Code: {hex(event.key())}) (Mod Key: {hex(event.nativeModifiers())}) (Virtual Key: {event.nativeVirtualKey()}) (Scancode: {event.nativeScanCode()})")
 
         # Send BLE
         if self.ble_manager:
-            self.ble_manager.send_data_sync(f"R:{hex(event.key())}")
+            self.ble_manager.send_data_sync(b"R:%#x" % event.key())
 
     def closeEvent(self, event):
         print("Program Termination")
-        self.timer.stop()
         self.cap.stop()
         event.accept()
 
@@ -275,16 +209,22 @@ def select_camera_by_name(target_name, camera_names):
     return -1
 
 # ===================================================
-# 4. main 
+# 3. main 
 # ===================================================
 # If get Args, use it as camera index
 def main():
+    # 1) start PyQt5 App, single event loop for Qt and BLE
+    app = QApplication(sys.argv)
+    loop = qasync.QEventLoop(app)
+    asyncio.set_event_loop(loop)
 
+    # 2) BLE manager, starts scanning as soon as the loop runs
+    ble_manager = BleManager("Remote HID BLE", scan_timeout=5.0)
+    loop.create_task(ble_manager.run())
 
-
-
+    # 3) enumerate cameras in a worker thread, overlapping the BLE scan
     target_name = "UGREEN-25854"
-    camera_names = get_camera_names()
+    camera_names = loop.run_until_complete(asyncio.to_thread(get_camera_names))
     print("Available Cameras:")
     for idx, name in enumerate(camera_names):
         print(f"{idx}: {name}")
@@ -295,17 +235,13 @@ def main():
         sys.exit(1)
     
     print(f"Selected Camera: {selected_cam} : {camera_names[selected_cam]}")
-    # 1) BLE manager
-    ble_manager = BleManager()
-
-    # 2) start PyQt5 App
-    app = QApplication(sys.argv)
 
     # cam index
 
     window = VideoApp(selected_cam, camera_names[selected_cam], ble_manager=ble_manager)
     window.show()
-    sys.exit(app.exec_())
+    with loop:
+        loop.run_forever()
 
 
 if __name__ == "__main__":
@@ -4,8 +4,10 @@ from bleak import BleakScanner
 import asyncio
 
 async def scan():
-    devices = await BleakScanner.discover()
-    for device in devices:
-        print(device)
+    async with BleakScanner() as scanner:
+        await asyncio.sleep(5.0)
+        for device in scanner.discovered_devices:
+            print(device)
 
-run = asyncio.run(scan())
\ No newline at end of file
+if __name__ == "__main__":
+    asyncio.run(scan())
@@ -1,5 +1,4 @@
 import sys
-import threading
 import asyncio
 from PyQt5.QtWidgets import (
     QApplication, QLabel, QWidget, QVBoxLayout, QSizePolicy
@@ -8,13 +7,10 @@ from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtMultimedia import QCamera, QCameraInfo, QCameraViewfinderSettings
 from PyQt5.QtMultimediaWidgets import QCameraViewfinder
 from PyQt5.QtGui import QImage, QPixmap
-from bleak import BleakClient, BleakScanner
-from bleak.backends.characteristic import BleakGATTCharacteristic
-from bleak.backends.device import BLEDevice
-from bleak.backends.scanner import AdvertisementData
+import qasync
+
+from ble_manager import BleManager
 
-from itertools import count, takewhile
-from typing import Iterator
 # ---- TARGET CAPTURE BOARD NAME ----
 TARGET_CAMERA_NAME = "UGREEN-25854"
 
@@ -28,124 +24,25 @@ TARGET_CAPTURE_FPS = 60
 # ---- TARGET BLE DEVICE ----
 TARGET_BLE_NAME = "HID BLE Relay"
 
-# ---- NUS(UART) UUID ----
-HID_SERVICE_UUID = "597f1290-5b99-477d-9261-f0ed801fc566"
-HID_RX_CHAR_UUID = "597f1291-5b99-477d-9261-f0ed801fc566"  # Write
-HID_TX_CHAR_UUID = "597f1292-5b99-477d-9261-f0ed801fc566"  # Notify
-
-# ------------------------------------------------------
-def sliced(data: bytes, n: int) -> Iterator[bytes]:
-    return takewhile(len, (data[i : i + n] for i in count(0, n)))
-
-# ===================================================
-# 1. BLE Manager (Nordic UART Service)
-# ===================================================
-class BleManager:
-    def __init__(self):
-        self.client: BleakClient | None = None
-        self.connected = False
-        self.rx_char: BleakGATTCharacteristic | None = None
-
-        
-        self.loop = asyncio.new_event_loop()
-        self.thread = threading.Thread(target=self._run_loop, daemon=True)
-        self.thread.start()
-
-    def _run_loop(self):
-        asyncio.set_event_loop(self.loop)
-        while True:
-            try:
-                self.loop.run_until_complete(self.connect_and_run())
-            except Exception as e:
-                print(f"[BLE] Exeption : {e}")
-                self.loop.stop()
-                break
-
-    async def connect_and_run(self):
-        # find and connect to NUS device, then register notify
-
-        # 1) Scan Name 
-        def match_hid_device(device: BLEDevice, adv: AdvertisementData):
-            if device.name and TARGET_BLE_NAME in device.name:
-                print(f"[BLE] Found HID Device: {device.name}")
-                if HID_SERVICE_UUID.lower() in [s.lower() for s in adv.service_uuids]:
-                    return True
-            return False
-
-        print("[BLE] Scanning NUS device...")
-        device = await BleakScanner.find_device_by_filter(match_hid_device, timeout=10.0)
-        # print(device)
-
-        if device is None:
-            print("[BLE] NUS Device not found.")
-            return  # exit
-
-        def handle_disconnect(_: BleakClient):
-            print("[BLE] Device disconnected.")
-            for task in asyncio.all_tasks():
-                task.cancel()
-
-        # 2) connect to NUS device
-        print(f"[BLE] Connecting to {device.address}...")
-        async with BleakClient(device, disconnected_callback=handle_disconnect) as client:
-            self.client = client
-            self.connected = True
-            print("[BLE] Connected!")
-
-            # 3) Notify configuration (UART_TX_CHAR_UUID)
-            await client.start_notify(HID_TX_CHAR_UUID, self.handle_rx)
-            print("[BLE] Notify on (waiting for data)")
-
-            # 4) Save RX characteristic for write
-            nus_service = client.services.get_service(HID_SERVICE_UUID)
-            self.rx_char = nus_service.get_characteristic(HID_RX_CHAR_UUID)
-
-            try:
-                while True:
-                    await asyncio.sleep(1.0)
-            except asyncio.CancelledError:
-                pass
-            finally:
-                print("[BLE] connection closed.")
-                self.connected = False
-                self.client = None
-
-    def handle_rx(self, _: BleakGATTCharacteristic, data: bytearray):
-        print("[BLE] Recevied :", data)
-
-    def send_data_sync(self, msg: str):
-        if not self.connected or not self.rx_char:
-            print("[BLE] Not connected or RX characteristic not found.")
-            return
-
-        future = asyncio.run_coroutine_threadsafe(
-            self._send_data(msg), self.loop
-        )
-        # e.g. result = future.result()
-
-    async def _send_data(self, msg: str):
-        # BLE GATT write (async)
-        if not self.rx_char or not self.client:
-            print("[BLE] No client or RX characteristic.")
-            return
-
-        data = msg.encode()
-        max_size = self.rx_char.max_write_without_response_size
-        # sliced write for BLE packet size limit
-        for chunk in sliced(data, max_size):
-            await self.client.write_gatt_char(self.rx_char, chunk, response=False)
-        print(f"[BLE] send complete : {msg}")
-
+# ---- MOUSE MOVE THRESHOLD (manhattan distance in 0..32767 space) ----
+MOUSE_MOVE_THRESHOLD = 200
 
 # ===================================================
-# 2. PyQt5 GUI App (QtMultimedia Camera + BLE)
+# 1. PyQt5 GUI App (QtMultimedia Camera + BLE)
 # ===================================================
 class VideoApp(QWidget):
-    def __init__(self, camera_index=0, ble_manager=None):
+    def __init__(self, camera_index=0, ble_manager=None, cameras=None):
         super().__init__()
         self.setWindowTitle(f"PyQt5 + QtMultimedia (Camera {camera_index})")
         self.ble_manager = ble_manager
 
+        # cached video display rect, recomputed after resize
+        self._rect_cache = None
+        self._scale_cache = None
+
+        # last mouse move position sent to the dongle
+        self._last_sent_xy = (-1, -1)
+
         # Init UI
         self.setGeometry(100, 200, 960, 540)
 
@@ -159,7 +56,8 @@ class VideoApp(QWidget):
         self.setLayout(self.layout)
 
         # Select and configure camera
-        cameras = QCameraInfo.availableCameras()
+        if cameras is None:
+            cameras = QCameraInfo.availableCameras()
         if not cameras:
             print("No cameras available.")
             sys.exit()
@@ -173,6 +71,7 @@ class VideoApp(QWidget):
         self.camera.setViewfinder(self.camera_viewfinder)
 
         self.camera.setViewfinderSettings(viewfinder_settings)
+        self.camera.statusChanged.connect(self._invalidate_rect)
         self.camera.start()
         print(self.camera.supportedViewfinderResolutions())
         print("current resolution: ", self.camera.viewfinderSettings().resolution())
@@ -180,18 +79,29 @@ class VideoApp(QWidget):
     def keyPressEvent(self, event):
         print(f"Key Pressed: {hex(event.key())}")
         if self.ble_manager:
-            self.ble_manager.send_data_sync(f"KP:{hex(event.key())}")
+            self.ble_manager.send_data_sync(b"KP:%#x" % event.key())
 
     def keyReleaseEvent(self, event):
         if self.ble_manager:
-            self.ble_manager.send_data_sync(f"KR:{hex(event.key())}")
+            self.ble_manager.send_data_sync(b"KR:%#x" % event.key())
 
     def closeEvent(self, event):
         print("Program Termination")
         self.camera.stop()
         event.accept()
 
+    def resizeEvent(self, event):
+        self._invalidate_rect()
+        super().resizeEvent(event)
+
+    def _invalidate_rect(self, *_):
+        self._rect_cache = None
+        self._scale_cache = None
+
     def get_video_display_rect(self):
+        if self._rect_cache is not None:
+            return self._rect_cache
+
         resolution = self.camera.viewfinderSettings().resolution()
         video_width, video_height = resolution.width(), resolution.height()
 
@@ -212,61 +122,81 @@ class VideoApp(QWidget):
             offset_x = (viewfinder_width - display_width) // 2
             offset_y = 0
 
-        return offset_x, offset_y, display_width, display_height, video_width, video_height
+        self._rect_cache = (offset_x, offset_y, display_width, display_height, video_width, video_height)
+        self._scale_cache = (32767 / display_width, 32767 / display_height)
+        return self._rect_cache
 
     def mousePressEvent(self, event):
         x_fs, y_fx, width, height, rw, rh = self.get_video_display_rect()
 
         pos_x = int((event.pos().x() - x_fs)/width*32767)
         pos_y = int((event.pos().y() - y_fx)/height*32767)
+        # measure drag moves from the press point
+        self._last_sent_xy = (pos_x, pos_y)
         # print
         # print(f"pos: {self.camera.geometry()} ")
         # print(f"Mouse Pressed: {event.pos()} -> {widget_pos}")
         if event.button() == Qt.LeftButton:
             # print(f"Mouse Left Pressed: {event.pos()}")
             if self.ble_manager:
-                self.ble_manager.send_data_sync(f"ML:{pos_x},{pos_y}")
+                self.ble_manager.send_data_sync(b"ML:%d,%d" % (pos_x, pos_y))
         elif event.button() == Qt.RightButton:
             # print(f"Mouse Right Pressed: {event.pos()}")
             if self.ble_manager:
-                self.ble_manager.send_data_sync(f"MR:{pos_x},{pos_y}")
+                self.ble_manager.send_data_sync(b"MR:%d,%d" % (pos_x, pos_y))
 
     def mouseReleaseEvent(self, event):
         x_fs, y_fx, width, height,rw,rh = self.get_video_display_rect()
 
         pos_x = int((event.pos().x() - x_fs)/width*32767)
         pos_y = int((event.pos().y() - y_fx)/height*32767)
+        self._last_sent_xy = (-1, -1)
 
         # print(f"Mouse Released: {event.pos()}")
         if event.button() == Qt.LeftButton:
             if self.ble_manager:
-                self.ble_manager.send_data_sync(f"MS:{pos_x},{pos_y}")
+                self.ble_manager.send_data_sync(b"MS:%d,%d" % (pos_x, pos_y))
         elif event.button() == Qt.RightButton:
             if self.ble_manager:
-                self.ble_manager.send_data_sync(f"ME:{pos_x},{pos_y}")
+                self.ble_manager.send_data_sync(b"ME:%d,%d" % (pos_x, pos_y))
 
     def mouseMoveEvent(self, event):
+        if self.ble_manager is None or not self.ble_manager.connected:
+            return
+
         x_fs, y_fx, width, height,rw,rh = self.get_video_display_rect()
+        scale_x, scale_y = self._scale_cache
+
+        pos_x = int((event.pos().x() - x_fs)*scale_x)
+        pos_y = int((event.pos().y() - y_fx)*scale_y)
+        # skip jitter below the threshold
+        last_x, last_y = self._last_sent_xy
+        if abs(pos_x - last_x) + abs(pos_y - last_y) < MOUSE_MOVE_THRESHOLD:
+            return
+        self._last_sent_xy = (pos_x, pos_y)
 
-        pos_x = int((event.pos().x() - x_fs)/width*32767)
-        pos_y = int((event.pos().y() - y_fx)/height*32767)
         # print(f"Mouse Moved: {event.pos()}")
-        if self.ble_manager:
-            self.ble_manager.send_data_sync(f"ML:{pos_x},{pos_y}")
+        self.ble_manager.queue_move(pos_x, pos_y)
 
 
 # ===================================================
-# 3. Main Function
+# 2. Main Function
 # ===================================================
 def main():
     app = QApplication(sys.argv)
 
-    # BLE manager
-    ble_manager = BleManager()
+    # single event loop for Qt and BLE
+    loop = qasync.QEventLoop(app)
+    asyncio.set_event_loop(loop)
+
+    # BLE manager, starts scanning as soon as the loop runs
+    ble_manager = BleManager(TARGET_BLE_NAME)
+    loop.create_task(ble_manager.run())
     selected_camera_index = 0
 
     target_found = False
-    # Select the first available camera
+    # Enumerate cameras on the GUI thread, QtMultimedia objects must live here
+    # (cheap next to the BLE scan, which starts as soon as the loop runs)
     cameras = QCameraInfo.availableCameras()
     print("Available Cameras:")
     for idx, camera_info in enumerate(cameras):
@@ -286,9 +216,10 @@ def main():
     print(f"Selected Camera: {selected_camera_index}: {cameras[selected_camera_index].description()}")
 
     # Start the PyQt5 application
-    window = VideoApp(selected_camera_index, ble_manager=ble_manager)
+    window = VideoApp(selected_camera_index, ble_manager=ble_manager, cameras=cameras)
     window.show()
-    sys.exit(app.exec_())
+    with loop:
+        loop.run_forever()
 
 
 if __name__ == "__main__":